@@ -1,45 +1,97 @@
 import ast
+import hashlib
+import io
+import os
+import pickle
 import sys
 import re
-from abc import ABCMeta, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 
-class Analyzer(metaclass=ABCMeta):
+class Analyzer:
 
-    PATTERN_NOT_CAMEL_CASE = re.compile(r'[a-z0-9_]\w*')
-    PATTERN_NOT_SNAKE_CASE = re.compile(r'[A-Z0-9]\w*')
+    # Parsed ASTs are cached here between runs. Entries are never
+    # removed: delete the directory to clear the cache, or set the
+    # JBA_ANALYZER_NO_CACHE environment variable to disable it.
+    AST_CACHE = None if os.environ.get('JBA_ANALYZER_NO_CACHE') else (
+        Path.home() / '.cache' / 'jba_analyzer')
+    # Direct subclasses, registered when they are defined.
+    checks = ()
+    # Code and message of the check, defined in the derived classes.
+    code = None
+    message = None
 
-    @property
-    @abstractmethod
-    def code(self):
-        """Code of the check."""
-
-    @property
-    @abstractmethod
-    def message(self):
-        """Message of the check."""
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.checks = ()
+        for base in cls.__bases__:
+            if issubclass(base, Analyzer):
+                base.checks += (cls,)
 
     @classmethod
-    @abstractmethod
     def check(cls, obj):
         """Check if a condition is true over obj.
 
         This method needs to be implemented in the derived classes.
 
         :param obj: Object checked.
-        :returns: True if the condition checked is true, false
+        :returns: The message for the user if the condition checked is
+                  true, None otherwise.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def is_not_camel_case(cls, name):
+        """Check if a name is not written in CamelCase.
+
+        Only the first character of the name is checked.
+
+        :param name: Name checked.
+        :returns: True if the name is not written in CamelCase, false
                   otherwise.
         """
-        pass
+        first = name[:1]
+        return first == '_' or first.islower() or first.isdigit()
+
+    @classmethod
+    def is_not_snake_case(cls, name):
+        """Check if a name is not written in snake_case.
+
+        Only the first character of the name is checked.
+
+        :param name: Name checked.
+        :returns: True if the name is not written in snake_case, false
+                  otherwise.
+        """
+        first = name[:1]
+        return first.isupper() or first.isdigit()
+
+    @classmethod
+    def result(cls, path, lineno, code, message):
+        """Build the result of a failed check.
+
+        :param path: Path of the file checked.
+        :param lineno: Number of the line where the check failed.
+        :param code: Code of the failed check.
+        :param message: Message of the failed check.
+        :returns: A dictionary containing line number, code and message
+                  of the failed check.
+        """
+        return {
+            'lineno': lineno,
+            'code': code,
+            'message': f'{path}: Line {lineno}: {code} {message}',
+        }
 
     @classmethod
     def exec(cls, path, obj, lineno):
         """Execute the check defined inside the derived class.
 
-        If the check returns True (i.e. there is something to fix),
-        this function prints a help message for the user with details
-        and result of the check.
+        If the check returns a message (i.e. there is something to
+        fix), this function returns it for the user together with the
+        details of the check.
 
         :param path: Path of the file checked.
         :param obj: Object checked.
@@ -47,24 +99,94 @@ class Analyzer(metaclass=ABCMeta):
         :returns: A dictionary containing line number, code and message
                   of the failed check.
         """
-        if cls.check(obj):
-            return {
-                'lineno': lineno,
-                'code': cls.code,
-                'message': f'{path}: Line {lineno}: {cls.code} {cls.message}',
-            }
+        if (message := cls.check(obj)) is not None:
+            return cls.result(path, lineno, cls.code, message)
 
     @classmethod
-    @abstractmethod
-    def execute_checks(cls, code, file):
+    def source(cls, file, text):
+        """Convert the text of a file into the source expected by the
+        checks in a checker.
+
+        This method needs to be implemented in the derived classes.
+
+        :param file: Path of the file checked.
+        :param text: Text of the file.
+        :returns: Source of the file in the form expected by the
+                  checker (e.g. its lines or its AST).
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def execute_checks(cls, file, source):
         """Execute all the checks in a checker.
 
-        :param code: Code of the file to check as a file object.
-        :param file: Path of the file opened.
+        :param file: Path of the file checked.
+        :param source: Source of the file in the form expected by the
+                       checker (e.g. its lines or its AST).
         :returns: A list of dictionaries that contains data of the
                   failed checks.
         """
-        pass
+        raise NotImplementedError
+
+    @classmethod
+    def parse(cls, text, file='<unknown>'):
+        """Parse source code into an AST, using the cache on disk when
+        the same code has already been parsed.
+
+        :param text: Source code to parse.
+        :param file: Path of the file parsed, used in syntax errors.
+        :returns: The AST of the source code.
+        """
+        if cls.AST_CACHE is None:
+            return ast.parse(text, filename=str(file), type_comments=False)
+
+        # The AST changes between Python versions, so the version is
+        # part of the key.
+        version = '.'.join(map(str, sys.version_info[:2]))
+        key = hashlib.sha256(f'{version}\n{text}'.encode()).hexdigest()
+        cached = cls.AST_CACHE / key
+
+        try:
+            return pickle.loads(cached.read_bytes())
+        except Exception:
+            # Missing or corrupt entries can fail in many ways, in any
+            # case the source is parsed again.
+            pass
+
+        tree = ast.parse(text, filename=str(file), type_comments=False)
+        try:
+            cls.AST_CACHE.mkdir(parents=True, exist_ok=True)
+            # Write under a temporary name first, so that a concurrent
+            # run never reads a partially written file.
+            temp = cached.with_suffix(f'.{os.getpid()}.tmp')
+            temp.write_bytes(pickle.dumps(tree))
+            temp.replace(cached)
+        except (OSError, RecursionError, pickle.PicklingError):
+            # The cache is an optimization, go on without it (e.g. when
+            # the tree is too deep to be pickled).
+            pass
+
+        return tree
+
+    @classmethod
+    def analyze(cls, file):
+        """Run all the implemented check on a given file.
+
+        :param file: Path of the file to check.
+        :returns: A list of the messages of the failed checks, sorted
+                  by line number and code.
+        """
+        # Read the file only once, then let each checker convert the
+        # text into the source it needs.
+        text = Path(file).read_text()
+
+        results = list()
+        for checker in cls.checks:
+            source = checker.source(file, text)
+            results.extend(checker.execute_checks(file, source))
+
+        return [result['message'] for result in
+                sorted(results, key=lambda r: (r['lineno'], r['code']))]
 
     @classmethod
     def run(cls, file):
@@ -73,45 +195,132 @@ class Analyzer(metaclass=ABCMeta):
 
         :param file: Path of the file to check.
         """
+        for message in cls.analyze(file):
+            print(message)
 
-        results = list()
-        with open(file) as code:
-            for checker in cls.__subclasses__():
-                results.extend(checker.execute_checks(file, code))
-                code.seek(0)
 
-        for result in sorted(results, key=lambda r: (r['lineno'], r['code'])):
-            print(result['message'])
+class LineChecker(Analyzer):
+    """Base class for checks on file lines."""
 
+    # Quoted text and comments are matched as a whole, so that the
+    # semicolons and comments outside quoted text can be told apart
+    # from those inside. Quoted text that doesn't end on the same line
+    # (e.g. in the lines of a docstring) runs to the end of it.
+    PATTERN_TOKENS = re.compile(r'''"""(?:\\.|[^\\])*?(?:"""|$)'''
+                                r"""|'''(?:\\.|[^\\])*?(?:'''|$)"""
+                                r'''|"[^"\\]*(?:\\.[^"\\]*)*(?:"|$)'''
+                                r"""|'[^'\\]*(?:\\.[^'\\]*)*(?:'|$)"""
+                                r'|#.*'
+                                r'|;')
+
+    # Substrings of which at least one must be in a line for the check
+    # to fail on it. Checks without triggers are executed on every line.
+    triggers = ()
 
-class LineChecker(Analyzer, metaclass=ABCMeta):
-    """Base class for checks on file lines."""
+    @classmethod
+    def source(cls, file, text):
+        # Split on newlines only, like iterating over the file does:
+        # splitlines would also split on form feeds and other line
+        # boundaries, shifting the line numbers after them.
+        return io.StringIO(text).readlines()
+
+    @classmethod
+    def reset(cls):
+        """Reset the state kept by the check between lines.
+
+        This method is called before checking a new file and needs to
+        be overridden by the checks that keep state between lines.
+        """
+        pass
 
     @classmethod
-    def execute_checks(cls, file, code):
+    def execute_checks(cls, file, lines):
         results = list()
-        for i, line in enumerate(code, start=1):
-            for check in cls.__subclasses__():
-                if (result := check.exec(file, line, i)) is not None:
-                    results.append(result)
+        # Look up the checks once: this loop runs for every line of
+        # every file, so avoid going through exec for each line.
+        checks = list()
+        triggered = dict()
+        for check in cls.checks:
+            check.reset()
+            entry = (check.check, check.code)
+            if not check.triggers:
+                checks.append(entry)
+            for trigger in check.triggers:
+                triggered.setdefault(trigger, list()).append(entry)
+
+        # Look for the triggers of all the checks with a single scan of
+        # the line, then execute only the checks that can fail on it.
+        scanner = re.compile('|'.join(map(re.escape, triggered)))
+
+        for i, line in enumerate(lines, start=1):
+            line_checks = checks
+            if triggered and (found := set(scanner.findall(line))):
+                line_checks = checks + list({
+                    entry for trigger in found for entry in triggered[trigger]
+                })
+
+            for check_line, check_code in line_checks:
+                if (message := check_line(line)) is not None:
+                    results.append(cls.result(file, i, check_code, message))
 
         return results
 
 
-class AstChecker(Analyzer, metaclass=ABCMeta):
+class AstChecker(Analyzer):
     """Base class for checks on the abstract syntax tree of the file."""
 
+    # Types of the nodes checked.
+    node_types = ()
+
+    @classmethod
+    def source(cls, file, text):
+        return cls.parse(text, file)
+
+    @classmethod
+    def walk(cls, tree, skip=()):
+        """Iterate over the nodes of a tree like ast.walk, without
+        descending into the nodes of the given types.
+
+        :param tree: Root of the tree to walk.
+        :param skip: Types of the nodes to leave out, together with
+                     their descendants.
+        :returns: A generator of the nodes of the tree.
+        """
+        todo = deque([tree])
+        while todo:
+            node = todo.popleft()
+            yield node
+            for field in node._fields:
+                child = getattr(node, field, None)
+                if isinstance(child, list):
+                    todo.extend(item for item in child
+                                if isinstance(item, ast.AST)
+                                and not isinstance(item, skip))
+                elif (isinstance(child, ast.AST)
+                      and not isinstance(child, skip)):
+                    todo.append(child)
+
     @classmethod
-    def execute_checks(cls, file, code):
+    def execute_checks(cls, file, tree):
         results = list()
-        tree = ast.parse(code.read())
-        lineno = 0
-
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.expr, ast.stmt)):
-                lineno = node.lineno
-            for check in cls.__subclasses__():
-                if (result := check.exec(file, node, lineno)) is not None:
+        # Map each node type to the checks on it, so that every node is
+        # passed only to the checks that need it.
+        dispatch = dict()
+        for check in cls.checks:
+            for node_type in check.node_types:
+                dispatch.setdefault(node_type, list()).append(check)
+
+        # Expressions can't contain statements, so there is no need to
+        # visit them unless an expression is checked.
+        skip = (ast.expr,)
+        if any(issubclass(node_type, ast.expr) for node_type in dispatch):
+            skip = ()
+
+        for node in cls.walk(tree, skip):
+            if (checks := dispatch.get(type(node))) is None:
+                continue
+            for check in checks:
+                if (result := check.exec(file, node, node.lineno)) is not None:
                     results.append(result)
 
         return results
@@ -126,61 +335,59 @@ class CheckTooLong(LineChecker):
         """Check if the line is over 79 characters long.
 
         :param line: Line of the file checked.
-        :returns: True if the line is over 79 characters long, false
-                  otherwise.
+        :returns: The message of the check if the line is over 79
+                  characters long, None otherwise.
         """
-        # Remove newline and spaces at the end before counting characters.
-        return len(line.rstrip()) > 79
+        # Remove newline and spaces at the end before counting characters,
+        # but only on the lines that can be too long, to avoid copying
+        # all the others.
+        if len(line) > 79 and len(line.rstrip()) > 79:
+            return cls.message
 
 
 class CheckIndentationIsNotAMultipleOfFour(LineChecker):
     code = 'S002'
     message = 'Indentation is not a multiple of four'
+    pattern = re.compile(r' *')
 
     @classmethod
     def check(cls, line):
         """Check that the indentation is not a multiple of four spaces.
 
         :param line: Line of the file checked.
-        :returns: True if the indentation is not a multiple of four,
-                  false otherwise.
+        :returns: The message of the check if the indentation is not
+                  a multiple of four, None otherwise.
         """
-        # Only spaces must be stripped to avoid issues with blank
-        # lines (i.e. the newline is otherwise removed and an empty
-        # obj seems incorrectly indented).
-        spaces = len(line) - len(line.lstrip(' '))
-        return spaces % 4 != 0
+        # Only spaces must be counted to avoid issues with blank
+        # lines (i.e. the newline would otherwise be counted and an
+        # empty obj would seem incorrectly indented). Matching them
+        # avoids copying the rest of the line as lstrip would do.
+        if cls.pattern.match(line).end() % 4 != 0:
+            return cls.message
 
 
 class CheckUnnecessarySemicolon(LineChecker):
     code = 'S003'
     message = 'Unnecessary semicolon'
+    triggers = (';',)
 
     @classmethod
     def check(cls, line):
         """Check if there are unnecessary semicolons on the given obj.
 
         :param line: Line of the file checked.
-        :returns: True if there are unnecessary semicolons, false otherwise.
+        :returns: The message of the check if there are unnecessary
+                  semicolons, None otherwise.
         """
-        single_quotes = False  # Are we inside quoted text?
-        double_quotes = False
-        for char in line:
-            if char == '#':
-                break
-            if char == '"' and not single_quotes:  # Jump in and out of quotes
-                double_quotes = not double_quotes
-            if char == "'" and not double_quotes:  # Same as above
-                single_quotes = not single_quotes
-            if char == ';' and not (single_quotes or double_quotes):
-                return True
-
-        return False
+        if any(match.group() == ';'
+               for match in cls.PATTERN_TOKENS.finditer(line)):
+            return cls.message
 
 
 class CheckLessThanTwoSpacesBeforeInlineComments(LineChecker):
     code = 'S004'
     message = 'At least two spaces required before inline comments'
+    triggers = ('#',)
 
     @classmethod
     def check(cls, line):
@@ -188,26 +395,35 @@ class CheckLessThanTwoSpacesBeforeInlineComments(LineChecker):
         comment.
 
         :param line: Line of the file checked.
-        :returns: True if there are less than two spaces before an
-                  inline comment, false otherwise.
+        :returns: The message of the check if there are less than two
+                  spaces before an inline comment, None otherwise.
         """
-        return not line.startswith('#') and '#' in line and '  #' not in line
+        for match in cls.PATTERN_TOKENS.finditer(line):
+            if match.group().startswith('#'):
+                # Comments at the start of the line are not inline
+                # comments.
+                start = match.start()
+                if start > 0 and line[start - 2:start] != '  ':
+                    return cls.message
+                break
 
 
 class CheckTodoFound(LineChecker):
     code = 'S005'
     message = 'TODO found'
+    triggers = ('#',)
+    pattern = re.compile(r'#.*todo', re.IGNORECASE)
 
     @classmethod
     def check(cls, line):
         """Check if there is a to-do comment on a given line.
 
         :param line: Line of the file checked.
-        :returns: True if there is a to-do comment, false otherwise.
+        :returns: The message of the check if there is a to-do comment,
+                  None otherwise.
         """
-        start = line.find('#')
-        comment = line[start:]
-        return 'todo' in comment.lower()
+        if cls.pattern.search(line) is not None:
+            return cls.message
 
 
 class CheckTooManyBlankLines(LineChecker):
@@ -215,6 +431,11 @@ class CheckTooManyBlankLines(LineChecker):
     message = 'Too many blank lines'
     blank_lines = 0
 
+    @classmethod
+    def reset(cls):
+        """Reset the count of blank lines seen before the current line."""
+        cls.blank_lines = 0
+
     @classmethod
     def check(cls, line):
         """Check if there are too many blank lines in the tested file.
@@ -223,25 +444,25 @@ class CheckTooManyBlankLines(LineChecker):
         check to be meaningful.
 
         :param line: Line of the file currently checked.
-        :returns: True if there are too many blank lines, false
-                  otherwise.
+        :returns: The message of the check if there are too many blank
+                  lines, None otherwise.
         """
 
-        too_many_blanks = False
+        message = None
 
-        if line.strip() == '':  # The obj is empty
+        if not line or line.isspace():  # The obj is empty
             cls.blank_lines += 1
         else:
             if cls.blank_lines > 2:
-                too_many_blanks = True
+                message = cls.message
             cls.blank_lines = 0  # Reset count on lines with text.
 
-        return too_many_blanks
+        return message
 
 
 class CheckTooManySpacesAfterConstructionName(LineChecker):
     code = 'S007'
-    message = ''
+    triggers = ('class', 'def')
     message_template = "Too many spaces after '{}'"
     pattern = re.compile(r' *(class|def)  +')
 
@@ -250,124 +471,131 @@ class CheckTooManySpacesAfterConstructionName(LineChecker):
         """Check if there are too many spaces after a constructor name.
 
         :param line: Line of the file currently checked.
-        :returns: True if there are too many spaces after a constructor
-                  name, false otherwise.
+        :returns: The message of the check if there are too many spaces
+                  after a constructor name, None otherwise.
         """
-        if (match := re.match(cls.pattern, line)) is not None:
-            cls.message = cls.message_template.format(match.group(1))
-            return True
-
-        return False
+        if (match := cls.pattern.match(line)) is not None:
+            return cls.message_template.format(match.group(1))
 
 
 class CheckClassNameShouldBeWrittenInCamelCase(AstChecker):
     code = 'S008'
-    message = ''
     message_template = "Class name '{}' should use CamelCase"
+    node_types = (ast.ClassDef,)
 
     @classmethod
     def check(cls, node):
         """Check if class names are not written in CamelCase.
 
         :param node: Node of the file AST currently checked.
-        :returns: True if there is a class name not written in
-                  CamelCase on the checked line, false otherwise.
+        :returns: The message of the check if there is a class name
+                  not written in CamelCase on the checked line, None
+                  otherwise.
         """
-        if isinstance(node, ast.ClassDef) and (
-                re.match(cls.PATTERN_NOT_CAMEL_CASE, node.name) is not None):
-            cls.message = cls.message_template.format(node.name)
-            return True
-
-        return False
+        if cls.is_not_camel_case(node.name):
+            return cls.message_template.format(node.name)
 
 
 class CheckFunctionNameShouldBeWrittenInSnakeCase(AstChecker):
     code = 'S009'
-    message = ''
     message_template = "Function name '{}' should use snake_case"
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
 
     @classmethod
     def check(cls, node):
         """Check if function names are not written in snake_case.
 
         :param node: Node of the file AST currently checked.
-        :returns: True if there is a function name not written in
-                  snake_case on the checked line, false otherwise.
+        :returns: The message of the check if there is a function name
+                  not written in snake_case on the checked line, None
+                  otherwise.
         """
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
-                re.match(cls.PATTERN_NOT_SNAKE_CASE, node.name) is not None):
-            cls.message = cls.message_template.format(node.name)
-            return True
-
-        return False
+        if cls.is_not_snake_case(node.name):
+            return cls.message_template.format(node.name)
 
 
 class CheckArgumentNameShouldBeWrittenInSnakeCase(AstChecker):
     code = 'S010'
-    message = ''
     message_template = "Argument name '{}' should be snake_case"
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
 
     @classmethod
     def check(cls, node):
         """Check if argument names are not written in snake_case.
 
         :param node: Node of the file AST currently checked.
-        :returns: True if there is an argument name not written in
-                  snake_case on the checked line, false otherwise.
+        :returns: The message of the check if there is an argument name
+                  not written in snake_case on the checked line, None
+                  otherwise.
         """
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-            for arg in node.args.args:
-                if re.match(cls.PATTERN_NOT_SNAKE_CASE, arg.arg) is not None:
-                    cls.message = cls.message_template.format(arg.arg)
-                    return True
-
-        return False
+        for arg in node.args.args:
+            if cls.is_not_snake_case(arg.arg):
+                return cls.message_template.format(arg.arg)
 
 
 class CheckVariableShouldBeWrittenInSnakeCase(AstChecker):
     code = 'S011'
-    message = ''
     message_template = "Variable '{}' in function should be snake_case"
+    node_types = (ast.Assign, ast.AugAssign, ast.AnnAssign)
 
     @classmethod
     def check(cls, node):
         """Check if variable names are not written in snake_case.
 
         :param node: Node of the file AST currently checked.
-        :returns: True if there is a variable name not written in
-                  snake_case on the checked line, false otherwise.
+        :returns: The message of the check if there is a variable name
+                  not written in snake_case on the checked line, None
+                  otherwise.
         """
-        target = None
-
         if isinstance(node, ast.Assign):
             target = node.targets[0]  # That's a simplification
-        if isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+        else:
             target = node.target
 
-        if isinstance(target, ast.Name) and (
-                re.match(cls.PATTERN_NOT_SNAKE_CASE, target.id) is not None):
-            cls.message = cls.message_template.format(target.id)
-            return True
-
-        return False
+        if isinstance(target, ast.Name) and cls.is_not_snake_case(target.id):
+            return cls.message_template.format(target.id)
 
 
 class CheckDefaultArgumentValueIsMutable(AstChecker):
     code = 'S012'
     message = 'Default argument value is mutable'
     mutable = (ast.Dict, ast.List, ast.Set)
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
 
     @classmethod
     def check(cls, node):
         """Check if a default argument value is mutable.
 
         :param node: Node of the file AST currently checked.
-        :returns: True if there is default argument value that is
-                  mutable, false otherwise.
+        :returns: The message of the check if there is default argument
+                  value that is mutable, None otherwise.
         """
-        return isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and any(
-            isinstance(arg, cls.mutable) for arg in node.args.defaults
-        )
+        if any(isinstance(arg, cls.mutable) for arg in node.args.defaults):
+            return cls.message
+
+
+def find_sources(root):
+    """Recursively find the source code files inside a directory.
+
+    Hidden directories and directories that don't contain project code
+    (e.g. caches and dependencies) are skipped.
+
+    :param root: Path of the directory.
+    :returns: A generator of the paths of the files found, sorted by
+              path.
+    """
+    skipped = {'__pycache__', 'node_modules', 'venv'}
+    with os.scandir(root) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
+
+    # Files and subdirectories are visited together in name order, so
+    # that the paths come out sorted without collecting them first.
+    for entry in entries:
+        if entry.is_dir():
+            if not entry.name.startswith('.') and entry.name not in skipped:
+                yield from find_sources(entry.path)
+        elif entry.name.endswith('.py'):
+            yield entry.path
 
 
 def main():
@@ -379,8 +607,13 @@ def main():
 
     if path.is_dir():
         # Recursively execute checks on all the source code files.
-        for file in sorted(path.glob('**/*.py')):
-            Analyzer.run(file)
+        # Files are independent, so they are analyzed in parallel and
+        # the results printed in order once available.
+        with ProcessPoolExecutor() as executor:
+            for messages in executor.map(Analyzer.analyze,
+                                         find_sources(path), chunksize=8):
+                for message in messages:
+                    print(message)
 
 
 if __name__ == '__main__':
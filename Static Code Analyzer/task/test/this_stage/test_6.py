@@ -0,0 +1,5 @@
+def greet(name):
+    print(name)
+
+
+
@@ -0,0 +1,12 @@
+def farewell(name):
+    """Say goodbye to someone.
+
+    It's fine; really.
+    """
+    print(name)
+
+
+doc = """Say goodbye;
+then leave."""
+note = '''Wave; then go.'''
+print("#")  # Only this hash starts a comment
@@ -182,6 +182,8 @@ class AnalyzerTest(StageTest):
         file_1 = cur_dir.lower() + f"{os.sep}test{os.sep}this_stage{os.sep}test_3.py"
         file_2 = cur_dir.lower() + f"{os.sep}test{os.sep}this_stage{os.sep}test_4.py"
         file_3 = cur_dir.lower() + f"{os.sep}test{os.sep}this_stage{os.sep}test_5.py"
+        file_4 = cur_dir.lower() + f"{os.sep}test{os.sep}this_stage{os.sep}test_6.py"
+        file_5 = cur_dir.lower() + f"{os.sep}test{os.sep}this_stage{os.sep}test_7.py"
 
         output = output.strip().lower().splitlines()
 
@@ -212,6 +214,13 @@ class AnalyzerTest(StageTest):
             if issue.startswith(f"{file_3}: line 8: {error_code_var_func_name}"):
                 return CheckResult.wrong(FALSE_ALARM + "The None keyword starts with a capital letter. ")
 
+            if issue.startswith(f"{file_4}: "):
+                return CheckResult.wrong(FALSE_ALARM)
+            if issue.startswith(f"{file_5}: line 1: {error_code_blank_lines}"):
+                return CheckResult.wrong(FALSE_ALARM + "The blank lines were at the end of the previous file. ")
+            if issue.startswith(f"{file_5}: "):
+                return CheckResult.wrong(FALSE_ALARM)
+
         # test_3 file
         if not output[0].startswith(f"{file_1}: line 9: {error_code_default_argument_is_mutable}"):
             return CheckResult.wrong(MUTABLE_ARG)